@@ -0,0 +1,95 @@
+from collections import OrderedDict
+from typing import Any, Hashable, Optional, Set
+
+
+class SLRUCache:
+    """
+    Segmented LRU cache.
+
+    New entries are put into a probationary segment and are only moved to the protected segment
+    once they are read a second time. The first read after an insert does not promote an entry,
+    since entries are usually inserted right before they are needed (e.g. blocks loaded ahead of
+    a single pass over a long range of blocks). Such entries are evicted from the probationary
+    segment without pushing frequently used entries out of the cache.
+
+    When the protected segment is full, its least recently used entry is moved back to the
+    probationary segment.
+    """
+
+    def __init__(self, probation_size: int, protected_size: int):
+        if probation_size < 1 or protected_size < 0:
+            raise ValueError(
+                f"Invalid segment sizes: probation_size={probation_size}, protected_size={protected_size}"
+            )
+        self.probation_size = probation_size
+        self.protected_size = protected_size
+        self.probation: OrderedDict = OrderedDict()
+        self.protected: OrderedDict = OrderedDict()
+        # Probationary keys which have been read since they were inserted
+        self.touched: Set[Hashable] = set()
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self.protected or key in self.probation
+
+    def __len__(self) -> int:
+        return len(self.protected) + len(self.probation)
+
+    def __getitem__(self, key: Hashable) -> Any:
+        if key in self.protected:
+            self.protected.move_to_end(key)
+            return self.protected[key]
+
+        # Raises KeyError if the key is not in the cache
+        value = self.probation[key]
+        if key not in self.touched or self.protected_size == 0:
+            self.touched.add(key)
+            self.probation.move_to_end(key)
+            return value
+
+        del self.probation[key]
+        self.touched.discard(key)
+        self.protected[key] = value
+        if len(self.protected) > self.protected_size:
+            demoted_key, demoted_value = self.protected.popitem(last=False)
+            # Demoted entries have been read before, so one more read promotes them again
+            self._put_in_probation(demoted_key, demoted_value, touched=True)
+        return value
+
+    def __setitem__(self, key: Hashable, value: Any) -> None:
+        if key in self.protected:
+            self.protected[key] = value
+            self.protected.move_to_end(key)
+        else:
+            self._put_in_probation(key, value)
+
+    def get(self, key: Hashable, default: Optional[Any] = None) -> Any:
+        """
+        Returns the value for the given key, counting it as an access.
+        """
+        if key not in self:
+            return default
+        return self[key]
+
+    def peek(self, key: Hashable, default: Optional[Any] = None) -> Any:
+        """
+        Returns the value for the given key without counting it as an access.
+        """
+        if key in self.protected:
+            return self.protected[key]
+        return self.probation.get(key, default)
+
+    def clear(self) -> None:
+        self.probation.clear()
+        self.protected.clear()
+        self.touched.clear()
+
+    def _put_in_probation(
+        self, key: Hashable, value: Any, touched: bool = False
+    ) -> None:
+        self.probation[key] = value
+        self.probation.move_to_end(key)
+        if touched:
+            self.touched.add(key)
+        while len(self.probation) > self.probation_size:
+            evicted_key, _ = self.probation.popitem(last=False)
+            self.touched.discard(evicted_key)
@@ -42,6 +42,14 @@ class EthereumStateProvider(ABC):
         """
         pass
 
+    def set_prefetch_limit(self, block_number: Optional[int]) -> None:
+        """
+        Sets the last block number which the provider may load ahead of the blocks it is asked for,
+        or None to disable loading ahead. Blocks past the limit may not be confirmed yet.
+        Providers which do not load blocks ahead can ignore it.
+        """
+        pass
+
 
 class Web3StateProvider(EthereumStateProvider):
     """
@@ -108,11 +108,12 @@ class PickleFileState(FunctionCallCrawlerState):
 # For now casting to hex, because that byte at top is function signature
 # .decode() fails
 def utfy_dict(dic):
-    if isinstance(dic, str):
+    # Scalars are checked first since most of the decoded values are addresses and numbers
+    if isinstance(dic, (str, int)):
         return dic
 
     elif isinstance(dic, bytes):
-        return Web3.toHex(dic)
+        return "0x" + bytes.hex(dic)
 
     elif isinstance(dic, tuple):
         return tuple(utfy_dict(x) for x in dic)
@@ -180,15 +181,19 @@ class FunctionCallCrawler:
                 status=transaction_reciept["status"],
                 gas_used=transaction_reciept["gasUsed"],
             )
-
-            self.state.register_call(function_call)
         except Exception as e:
             print(f"Failed to decode function call in tx: {transaction['hash'].hex()}")
             if self.on_decode_error:
                 self.on_decode_error(e)
             print(e)
+        else:
+            # Outside of the try, since the state may flush the calls it has accumulated so far
+            # and errors from storing them are not decoding errors.
+            self.state.register_call(function_call)
 
     def crawl(self, from_block: int, to_block: int, flush_state: bool = False):
+        # Blocks past to_block are not loaded ahead, they may not be confirmed yet
+        self.ethereum_state_provider.set_prefetch_limit(to_block)
         for block_number in range(from_block, to_block + 1):
             for address in self.contract_addresses:
                 transactions = self.ethereum_state_provider.get_transactions_to_address(
@@ -200,5 +205,6 @@ class FunctionCallCrawler:
                         self.process_transaction(transaction)
 
             self.state.state
+        self.ethereum_state_provider.set_prefetch_limit(None)
         if flush_state:
             self.state.flush()
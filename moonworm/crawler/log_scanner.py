@@ -1,12 +1,15 @@
 # Used example scanner from web3 documentation : https://web3py.readthedocs.io/en/stable/examples.html#eth-getlogs-limitations
 import datetime
-import json
 import logging
 import time
+from collections.abc import Mapping
+from dataclasses import dataclass, field
 from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Union
 
 from eth_abi.codec import ABICodec
+from eth_typing import HexStr
 from eth_typing.evm import ChecksumAddress
+from eth_utils import event_abi_to_log_topic
 from web3 import Web3
 from web3._utils.events import get_event_data
 from web3._utils.filters import construct_event_filter_params
@@ -14,7 +17,6 @@ from web3.datastructures import AttributeDict
 from web3.exceptions import BlockNotFound
 from web3.types import ABIEvent, FilterParams
 
-from .function_call_crawler import utfy_dict
 from .state import EventScannerState
 
 logging.basicConfig(level=logging.INFO)
@@ -112,16 +114,7 @@ def _fetch_events_chunk(
     for log in logs:
         try:
             raw_event = get_event_data(codec, event_abi, log)
-            event = {
-                "event": raw_event["event"],
-                "args": json.loads(Web3.toJSON(utfy_dict(dict(raw_event["args"])))),
-                "address": raw_event["address"],
-                "blockHash": raw_event["blockHash"],
-                "blockNumber": raw_event["blockNumber"],
-                "transactionHash": raw_event["transactionHash"].hex(),
-                "logIndex": raw_event["logIndex"],
-            }
-            all_events.append(event)
+            all_events.append(_event_from_raw_event(raw_event))
         except Exception as e:
             if on_decode_error:
                 on_decode_error(e)
@@ -129,9 +122,130 @@ def _fetch_events_chunk(
     return all_events
 
 
+def _to_jsonable(value: Any) -> Any:
+    """
+    Converts decoded event arguments into plain JSON compatible Python objects.
+
+    Produces the same result as json.loads(Web3.toJSON(utfy_dict(value))) without serializing
+    the arguments to a JSON string and parsing it back.
+    """
+    if isinstance(value, (str, int, float)) or value is None:
+        return value
+    elif isinstance(value, bytes):
+        # Same as Web3.toHex, without its type dispatch. bytes.hex is called explicitly since
+        # HexBytes.hex already adds the 0x prefix.
+        return "0x" + bytes.hex(value)
+    elif isinstance(value, Mapping):
+        return {str(key): _to_jsonable(item) for key, item in value.items()}
+    elif isinstance(value, (list, tuple)):
+        return [_to_jsonable(item) for item in value]
+    else:
+        return value
+
+
+def _event_from_raw_event(raw_event: Any) -> Dict[str, Any]:
+    return {
+        "event": raw_event["event"],
+        "args": _to_jsonable(raw_event["args"]),
+        "address": raw_event["address"],
+        "blockHash": raw_event["blockHash"],
+        "blockNumber": raw_event["blockNumber"],
+        "transactionHash": raw_event["transactionHash"].hex(),
+        "logIndex": raw_event["logIndex"],
+    }
+
+
+@dataclass
+class EventABIsByTopic:
+    """
+    Event ABIs indexed by their topic0, so that logs of several event types can be fetched with a
+    single eth_getLogs call and decoded without searching the ABI.
+
+    Anonymous events have no topic0 to match on, so they are kept separately.
+    """
+
+    by_topic: Dict[HexStr, ABIEvent] = field(default_factory=dict)
+    anonymous: List[ABIEvent] = field(default_factory=list)
+
+    @classmethod
+    def from_abis(cls, event_abis: List[Any]) -> "EventABIsByTopic":
+        index = cls()
+        for event_abi in event_abis:
+            if event_abi.get("anonymous"):
+                index.anonymous.append(event_abi)
+            else:
+                topic = Web3.toHex(event_abi_to_log_topic(event_abi))
+                index.by_topic[topic] = event_abi
+        return index
+
+
+def _fetch_multiple_events_chunk(
+    web3,
+    event_abis: Union[List[Any], EventABIsByTopic],
+    from_block: int,
+    to_block: int,
+    addresses: Optional[List[ChecksumAddress]] = None,
+    on_decode_error: Optional[Callable[[Exception], None]] = None,
+) -> List[Any]:
+    """Get events of several types using a single eth_getLogs call.
+
+    Logs are requested for any of the topic0 values of the given (non anonymous) events and decoded
+    with the ABI matching their topic0. Anonymous events have no topic0 to match on, so they are
+    fetched separately with _fetch_events_chunk.
+
+    Pass an EventABIsByTopic instead of a list of ABIs to avoid indexing the ABIs on every call.
+
+    Events have the same structure as the ones returned by _fetch_events_chunk.
+    """
+
+    if from_block is None:
+        raise TypeError("Missing mandatory keyword argument to getLogs: fromBlock")
+
+    codec: ABICodec = web3.codec
+
+    if not isinstance(event_abis, EventABIsByTopic):
+        event_abis = EventABIsByTopic.from_abis(event_abis)
+    topic_to_abi = event_abis.by_topic
+
+    all_events = []
+    if topic_to_abi:
+        filter_params: FilterParams = {
+            "fromBlock": from_block,
+            "toBlock": to_block,
+            "topics": [list(topic_to_abi)],
+        }
+        if addresses:
+            filter_params["address"] = addresses
+
+        logs = web3.eth.get_logs(filter_params)
+
+        for log in logs:
+            try:
+                event_abi = topic_to_abi[Web3.toHex(log["topics"][0])]
+                raw_event = get_event_data(codec, event_abi, log)
+                all_events.append(_event_from_raw_event(raw_event))
+            except Exception as e:
+                if on_decode_error:
+                    on_decode_error(e)
+                continue
+
+    for event_abi in event_abis.anonymous:
+        all_events.extend(
+            _fetch_events_chunk(
+                web3,
+                event_abi,
+                from_block,
+                to_block,
+                addresses,
+                on_decode_error,
+            )
+        )
+    return all_events
+
+
 def _crawl_events(
     web3: Web3,
-    event_abi: Any,
+    event_abi: Union[Any, List[Any], EventABIsByTopic],
     from_block: int,
     to_block: int,
     batch_size: int,
@@ -144,6 +258,9 @@ def _crawl_events(
     Crawls events from the given block range.
     reduces the batch_size if response is failing.
     increases the batch_size if response is successful.
+
+    If event_abi is a list of event ABIs (or an EventABIsByTopic), all of them are crawled with a
+    single eth_getLogs call per chunk of blocks.
     """
     events = []
     current_from_block = from_block
@@ -152,10 +269,16 @@ def _crawl_events(
         [contract_address] if isinstance(contract_address, str) else contract_address
     )  # for backwards compatibility
 
+    fetch_events_chunk: Callable[..., List[Any]] = _fetch_events_chunk
+    if isinstance(event_abi, list):
+        event_abi = EventABIsByTopic.from_abis(event_abi)
+    if isinstance(event_abi, EventABIsByTopic):
+        fetch_events_chunk = _fetch_multiple_events_chunk
+
     while current_from_block <= to_block:
         current_to_block = min(current_from_block + batch_size, to_block)
         try:
-            events_chunk = _fetch_events_chunk(
+            events_chunk = fetch_events_chunk(
                 web3,
                 event_abi,
                 current_from_block,
@@ -1,20 +1,24 @@
 import logging
-from typing import Any, Dict, List, Optional, Union
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional, Union
 
 from eth_typing.evm import ChecksumAddress
 from hexbytes.main import HexBytes
-from sqlalchemy.orm import Session
+from sqlalchemy import and_, exists
+from sqlalchemy.orm import Load, Query, Session, aliased
 from web3 import Web3
 
+from .cache import SLRUCache
 from .ethereum_state_provider import EthereumStateProvider
 from .networks import MODELS, Network, tx_raw_types
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Number of rows fetched at a time when streaming block ranges from the database
+DB_YIELD_PER = 1000
+
 
-# TODO(yhtiyar) When getting block from db, filter it by `to` address, it will be faster
-# also get blocks in bunch
 class MoonstreamEthereumStateProvider(EthereumStateProvider):
     """
     Implementation of EthereumStateProvider with moonstream.
@@ -26,6 +30,8 @@ class MoonstreamEthereumStateProvider(EthereumStateProvider):
         network: Network,
         db_session: Optional[Session] = None,
         batch_load_count: int = 100,
+        max_cache_size: int = 500,
+        web3_prefetch_count: int = 10,
     ):
         self.w3 = w3
         self.db_session = db_session
@@ -43,7 +49,22 @@ class MoonstreamEthereumStateProvider(EthereumStateProvider):
         self.labels_model = MODELS[network]["labels"]
         self.network = network
         self.batch_load_count = batch_load_count
-        self.blocks_cache = {}
+        self.max_cache_size = max_cache_size
+        # Segmented LRU cache, so that blocks which are only read once while crawling a long range
+        # do not evict the blocks which are read repeatedly.
+        protected_cache_size = max_cache_size // 5
+        self.blocks_cache = SLRUCache(
+            max_cache_size - protected_cache_size, protected_cache_size
+        )
+        # Number of consecutive blocks fetched concurrently from web3 when the database is behind.
+        # Blocks are only prefetched up to the limit set with set_prefetch_limit.
+        self.web3_prefetch_count = web3_prefetch_count
+        self._last_web3_block_number: Optional[int] = None
+        self._prefetch_limit: Optional[int] = None
+        # Reused between prefetches, since web3's HTTP provider keeps a session per thread
+        self._web3_executor: Optional[ThreadPoolExecutor] = None
+        if web3_prefetch_count > 1:
+            self._web3_executor = ThreadPoolExecutor(max_workers=web3_prefetch_count)
 
     def set_db_session(self, db_session: Session):
         self.db_session = db_session
@@ -51,22 +72,25 @@ class MoonstreamEthereumStateProvider(EthereumStateProvider):
     def clear_db_session(self):
         self.db_session = None
 
+    def set_prefetch_limit(self, block_number: Optional[int]) -> None:
+        self._prefetch_limit = block_number
+
     def get_transaction_reciept(self, transaction_hash: str) -> Dict[str, Any]:
         self.metrics["web3_get_transaction_receipt_calls"] += 1
         return self.w3.eth.get_transaction_receipt(transaction_hash)
 
     def get_last_block_number(self) -> int:
-        last_block = (
-            self.db_session.query(self.blocks_model)
+        last_block_number = (
+            self.db_session.query(self.blocks_model.block_number)
             .order_by(self.blocks_model.block_number.desc())
             .limit(1)
-            .one_or_none()
+            .scalar()
         )
-        if last_block is None:
+        if last_block_number is None:
             raise Exception(
                 f"No blocks in database, for network: {self.network.value} "
             )
-        return last_block.block_number
+        return last_block_number
 
     @staticmethod
     def _transform_to_w3_tx(tx_raw: tx_raw_types, raw_block) -> Dict[str, Any]:
@@ -87,81 +111,269 @@ class MoonstreamEthereumStateProvider(EthereumStateProvider):
         }
         return tx
 
+    def _blocks_load_only(self) -> Load:
+        """
+        Restricts loaded block columns to the ones cached by this provider.
+        """
+        return Load(self.blocks_model).load_only(
+            self.blocks_model.block_number,
+            self.blocks_model.hash,
+            self.blocks_model.timestamp,
+        )
+
+    def _transactions_load_only(self) -> Load:
+        """
+        Restricts loaded transaction columns to the ones used by _transform_to_w3_tx.
+        """
+        return Load(self.transactions_model).load_only(
+            self.transactions_model.block_number,
+            self.transactions_model.from_address,
+            self.transactions_model.gas,
+            self.transactions_model.gas_price,
+            self.transactions_model.hash,
+            self.transactions_model.input,
+            self.transactions_model.max_fee_per_gas,
+            self.transactions_model.max_priority_fee_per_gas,
+            self.transactions_model.nonce,
+            self.transactions_model.to_address,
+            self.transactions_model.transaction_index,
+            self.transactions_model.value,
+        )
+
     def _get_block_from_db(self, block_number: int) -> Optional[Dict[str, Any]]:
         if self.db_session is None:
             return None
 
         self.metrics["db_get_block_calls"] += 1
 
-        raw_blocks = (
-            self.db_session.query(self.blocks_model)
-            .filter(self.blocks_model.block_number >= block_number)
-            .order_by(self.blocks_model.block_number.asc())
-            .limit(self.batch_load_count)
-        )
-        blocks = {raw_block.block_number: raw_block for raw_block in raw_blocks}
-
-        if blocks.get(block_number) is None:
-            return None
-        # Assuming that all tx's from a block are written to db in the same db transaction
-        raw_block_transactions = (
-            self.db_session.query(self.transactions_model)
+        # Rows are streamed with a server side cursor and consumed once below.
+        # Assuming that all tx's from a block are written to db in the same db transaction,
+        # blocks without transactions are not indexed yet, so an inner join is enough.
+        rows = (
+            self.db_session.query(self.blocks_model, self.transactions_model)
+            .join(
+                self.transactions_model,
+                self.transactions_model.block_number == self.blocks_model.block_number,
+            )
+            .options(self._blocks_load_only(), self._transactions_load_only())
+            # Range and ordering are expressed on the transactions columns, so that transactions
+            # can be read in order from a (block_number, transaction_index) index without a sort.
             .filter(
-                self.transactions_model.block_number.in_(
-                    [block_number for block_number in blocks]
-                )
+                self.transactions_model.block_number.between(
+                    block_number, block_number + self.batch_load_count - 1
+                ),
+                self.blocks_model.block_number.between(
+                    block_number, block_number + self.batch_load_count - 1
+                ),
+            )
+            .order_by(
+                self.transactions_model.block_number.asc(),
+                self.transactions_model.transaction_index.asc(),
             )
-            .order_by(self.transactions_model.transaction_index.asc())
-            .all()
+            .yield_per(DB_YIELD_PER)
         )
         self.metrics["db_get_transaction_calls"] += 1
 
+        blocks = {}
         block_transactions = {}
 
-        for raw_tx in raw_block_transactions:
-            if block_transactions.get(raw_tx.block_number) is None:
-                block_transactions[raw_tx.block_number] = []
-            block_transactions[raw_tx.block_number].append(raw_tx)
+        for raw_block, raw_tx in rows:
+            if block_transactions.get(raw_block.block_number) is None:
+                blocks[raw_block.block_number] = raw_block
+                block_transactions[raw_block.block_number] = []
+            block_transactions[raw_block.block_number].append(raw_tx)
 
         if block_transactions.get(block_number) is None:
             return None
 
-        if len(self.blocks_cache) > 500:
-            self.blocks_cache = {}
+        result = None
+        for block, txs in block_transactions.items():
+            transformed_block = self._full_block(
+                blocks[block].timestamp,
+                [self._transform_to_w3_tx(tx, blocks[block]) for tx in txs],
+            )
+            self._cache_block(block, transformed_block)
+            if block == block_number:
+                result = transformed_block
+
+        return result
+
+    @staticmethod
+    def _full_block(timestamp: int, transactions: List[Any]) -> Dict[str, Any]:
+        """
+        Builds a cache entry for a block with all its transactions, which are also bucketed by
+        to address so that get_transactions_to_address does not scan the whole block.
+        """
+        transactions_by_to: Dict[str, List[Any]] = {}
+        for tx in transactions:
+            if tx["to"] is not None:
+                transactions_by_to.setdefault(tx["to"], []).append(tx)
+        return {
+            "timestamp": timestamp,
+            "transactions": transactions,
+            "transactions_by_to": transactions_by_to,
+        }
+
+    def _transactions_to_address_query(
+        self, address: ChecksumAddress, block_number: int
+    ) -> Query:
+        """
+        Query for the batch of blocks starting at block_number which have at least one transaction,
+        each joined with its transactions to the given address (or with None if there are none).
+        """
+        indexed_transactions = aliased(self.transactions_model)
+        return (
+            self.db_session.query(self.blocks_model, self.transactions_model)
+            .outerjoin(
+                self.transactions_model,
+                and_(
+                    self.transactions_model.block_number
+                    == self.blocks_model.block_number,
+                    self.transactions_model.to_address == address,
+                ),
+            )
+            .options(self._blocks_load_only(), self._transactions_load_only())
+            .filter(
+                self.blocks_model.block_number >= block_number,
+                self.blocks_model.block_number < block_number + self.batch_load_count,
+                exists().where(
+                    indexed_transactions.block_number == self.blocks_model.block_number
+                ),
+            )
+            .order_by(
+                self.blocks_model.block_number.asc(),
+                self.transactions_model.transaction_index.asc(),
+            )
+        )
+
+    def _get_transactions_to_address_from_db(
+        self, address: ChecksumAddress, block_number: int
+    ) -> Optional[List[Dict[str, Any]]]:
+        """
+        Loads from the database only the transactions to the given address, for the batch of blocks
+        starting at block_number. Blocks are cached as partial entries which only hold the
+        transactions of the addresses they were loaded for:
+        {"timestamp": ..., "transactions_for": {address: [...]}}
+
+        Returns None if block_number is not in the database. As in _get_block_from_db, blocks without
+        any transactions are treated as not indexed yet, so they are neither returned nor cached.
+        """
+        if self.db_session is None:
+            return None
+
+        self.metrics["db_get_block_calls"] += 1
+        self.metrics["db_get_transaction_calls"] += 1
+
+        rows = self._transactions_to_address_query(address, block_number).yield_per(
+            DB_YIELD_PER
+        )
+
+        blocks = {}
+        block_transactions: Dict[int, List[Dict[str, Any]]] = {}
+        for raw_block, raw_tx in rows:
+            if block_transactions.get(raw_block.block_number) is None:
+                blocks[raw_block.block_number] = raw_block
+                block_transactions[raw_block.block_number] = []
+            if raw_tx is not None:
+                block_transactions[raw_block.block_number].append(
+                    self._transform_to_w3_tx(raw_tx, raw_block)
+                )
 
         for block, txs in block_transactions.items():
-            self.blocks_cache[block] = {
-                "timestamp": blocks[block].timestamp,
-                "transactions": [
-                    self._transform_to_w3_tx(tx, blocks[block]) for tx in txs
-                ],
-            }
+            cached_block = self.blocks_cache.peek(block)
+            if cached_block is not None and "transactions_by_to" in cached_block:
+                # Full block is already cached
+                continue
+            if cached_block is None:
+                cached_block = {
+                    "timestamp": blocks[block].timestamp,
+                    "transactions_for": {},
+                }
+            cached_block["transactions_for"][address] = txs
+            self._cache_block(block, cached_block)
 
-        return self.blocks_cache[block_number]
+        return block_transactions.get(block_number)
+
+    def _cache_block(self, block_number: int, block: Dict[str, Any]) -> None:
+        self.blocks_cache[block_number] = block
 
     def _get_block(self, block_number: int) -> Dict[str, Any]:
         log_prefix = f"MoonstreamEthereumStateProvider._get_block: block_number={block_number},network={self.network.value}"
         logger.debug(log_prefix)
-        if block_number in self.blocks_cache:
+        # Timestamps are looked up for transactions which were just read from the cached block,
+        # so this is not counted as another access to it.
+        block = self.blocks_cache.peek(block_number)
+        if block is not None:
             logger.debug(f"{log_prefix} - found in cache")
             self.metrics["block_found_in_cache"] += 1
-            return self.blocks_cache[block_number]
+            return block
 
         block = self._get_block_from_db(block_number)
         if block is None:
             logger.debug(f"{log_prefix} - not found in db or cache, fetching from web3")
-            block = self.w3.eth.getBlock(block_number, full_transactions=True)
-            self.metrics["web3_get_block_calls"] += 1
+            block = self._get_block_from_web3(block_number)
         else:
             logger.debug(f"{log_prefix} - found in db")
 
-        # clear cache if it grows too large
-        if len(self.blocks_cache) > 500:
-            self.blocks_cache = {}
+        return block
+
+    def _get_block_from_web3(self, block_number: int) -> Dict[str, Any]:
+        if (
+            self._web3_executor is not None
+            and self._prefetch_limit is not None
+            and block_number < self._prefetch_limit
+            and self._last_web3_block_number is not None
+            and block_number == self._last_web3_block_number + 1
+        ):
+            # Blocks are being read one after another and are missing from the database,
+            # so the next ones will most likely have to be fetched from web3 as well.
+            prefetched_block_numbers = range(
+                block_number,
+                min(block_number + self.web3_prefetch_count, self._prefetch_limit + 1),
+            )
+            self._prefetch_blocks_from_web3(prefetched_block_numbers)
+            self._last_web3_block_number = prefetched_block_numbers[-1]
+
+            block = self.blocks_cache.peek(block_number)
+            if block is not None:
+                return block
 
-        self.blocks_cache[block_number] = block
+        raw_block = self.w3.eth.getBlock(block_number, full_transactions=True)
+        self.metrics["web3_get_block_calls"] += 1
+        block = self._full_block(raw_block["timestamp"], raw_block["transactions"])
+        self._cache_block(block_number, block)
+        self._last_web3_block_number = block_number
         return block
 
+    def _prefetch_blocks_from_web3(self, block_numbers: Iterable[int]) -> None:
+        """
+        Fetches the given blocks from web3 concurrently and caches them. Blocks which could not be
+        fetched (e.g. not mined yet) are skipped.
+        """
+        assert self._web3_executor is not None
+
+        def get_block(block_number: int) -> Any:
+            return self.w3.eth.getBlock(block_number, full_transactions=True)
+
+        futures = {
+            block_number: self._web3_executor.submit(get_block, block_number)
+            for block_number in block_numbers
+        }
+
+        for block_number, future in futures.items():
+            self.metrics["web3_get_block_calls"] += 1
+            try:
+                raw_block = future.result()
+            except Exception as e:
+                logger.debug(
+                    f"MoonstreamEthereumStateProvider._prefetch_blocks_from_web3: block_number={block_number},network={self.network.value} - failed: {e}"
+                )
+                continue
+            self._cache_block(
+                block_number,
+                self._full_block(raw_block["timestamp"], raw_block["transactions"]),
+            )
+
     def get_block_timestamp(self, block_number: int) -> int:
         logger.debug(
             f"MoonstreamEthereumStateProvider.get_block_timestamp: block_number={block_number},network={self.network.value}"
@@ -175,7 +387,20 @@ class MoonstreamEthereumStateProvider(EthereumStateProvider):
         logger.debug(
             f"MoonstreamEthereumStateProvider.get_transactions_to_address: address={address},block_number={block_number},network={self.network.value}"
         )
-        block = self._get_block(block_number)
+        # Addresses are matched exactly, as in the database query. Copies are returned so that
+        # callers can not modify the cached blocks.
+        block = self.blocks_cache.get(block_number)
+        if block is not None:
+            if "transactions_by_to" in block:
+                self.metrics["block_found_in_cache"] += 1
+                return list(block["transactions_by_to"].get(address, []))
+            if address in block["transactions_for"]:
+                self.metrics["block_found_in_cache"] += 1
+                return list(block["transactions_for"][address])
+
+        transactions = self._get_transactions_to_address_from_db(address, block_number)
+        if transactions is not None:
+            return list(transactions)
 
-        all_transactions = block["transactions"]
-        return [tx for tx in all_transactions if tx["to"] == address]
+        block = self._get_block_from_web3(block_number)
+        return list(block["transactions_by_to"].get(address, []))
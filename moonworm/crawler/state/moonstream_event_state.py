@@ -1,3 +1,6 @@
+from typing import Any, Dict, List
+
+from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import Query, Session
 from web3 import Web3
 
@@ -14,16 +17,16 @@ def get_block_timestamp(db_session: Session, web3: Web3, block_number: int) -> i
     if block_number in BLOCK_TIMESTAMP_CACHE:
         return BLOCK_TIMESTAMP_CACHE[block_number]
     try:
-        block = (
-            db_session.query(EthereumBlock)
+        timestamp = (
+            db_session.query(EthereumBlock.timestamp)
             .filter(EthereumBlock.block_number == block_number)
-            .query.one()
+            .scalar()
         )
-        if block is None:
-            raise ValueError("Block not found is db")
-        timstamp = block.timestamp
-    except Exception as e:
+    except SQLAlchemyError as e:
         print(e)
+        db_session.rollback()
+        timestamp = None
+    if timestamp is None:
         timestamp = web3.eth.get_block(block_number)["timestamp"]
 
     # clear cache if size is > 100
@@ -34,6 +37,44 @@ def get_block_timestamp(db_session: Session, web3: Web3, block_number: int) -> i
     return timestamp
 
 
+def get_block_timestamps(
+    db_session: Session, web3: Web3, block_numbers: List[int]
+) -> Dict[int, int]:
+    """
+    Get the timestamps of several blocks, loading all the uncached ones with a single query.
+    """
+    timestamps = {
+        block_number: BLOCK_TIMESTAMP_CACHE[block_number]
+        for block_number in block_numbers
+        if block_number in BLOCK_TIMESTAMP_CACHE
+    }
+    missing_block_numbers = set(block_numbers) - set(timestamps)
+    if not missing_block_numbers:
+        return timestamps
+
+    try:
+        rows = (
+            db_session.query(EthereumBlock.block_number, EthereumBlock.timestamp)
+            .filter(EthereumBlock.block_number.in_(missing_block_numbers))
+            .all()
+        )
+    except SQLAlchemyError as e:
+        print(e)
+        db_session.rollback()
+        rows = []
+    timestamps.update(rows)
+
+    for block_number in missing_block_numbers - set(timestamps):
+        timestamps[block_number] = web3.eth.get_block(block_number)["timestamp"]
+
+    # clear cache if size is > 100
+    if len(BLOCK_TIMESTAMP_CACHE) > 100:
+        BLOCK_TIMESTAMP_CACHE.clear()
+
+    BLOCK_TIMESTAMP_CACHE.update(timestamps)
+    return timestamps
+
+
 class MoonStreamEventState(EventScannerState):
     """
     MoonStream event state.
@@ -44,18 +85,18 @@ class MoonStreamEventState(EventScannerState):
         self.web3 = web3
         self.label_name = label_name
 
-        self.cache_state = []
+        self.cache_state: List[Dict[str, Any]] = []
 
     def get_last_scanned_block(self) -> int:
         last = (
-            self.db_session.query(EthereumLabel)
+            self.db_session.query(EthereumLabel.block_number)
             .filter(EthereumLabel.label_name == self.label_name)
             .order_by(EthereumLabel.block_number.desc())
             .first()
         )
         if last is None:
             return 0
-        return last.block_number
+        return last[0]
 
     def start_chunck() -> None:
         pass
@@ -65,7 +106,8 @@ class MoonStreamEventState(EventScannerState):
             EthereumLabel.label_name == self.label_name,
             EthereumLabel.block_number >= since_block,
         )
-        to_delete.delete()
+        # Labels are not kept in the session, so there is nothing to synchronize after the DELETE
+        to_delete.delete(synchronize_session=False)
         try:
             self.db_session.commit()
         except Exception as e:
@@ -75,15 +117,15 @@ class MoonStreamEventState(EventScannerState):
     def process_event(self, event: dict) -> None:
         """
         Process an event.
+
+        The block timestamp of the label is only looked up in flush_state, together with the
+        timestamps of all the other cached labels.
         """
-        block_number = event["blockNumber"]
-        timestamp = get_block_timestamp(self.db_session, self.web3, block_number)
-        label = EthereumLabel(
-            label_name=self.label_name,
-            block_number=block_number,
-            timestamp=timestamp,
-            event=event,
-        )
+        label = {
+            "label_name": self.label_name,
+            "block_number": event["blockNumber"],
+            "event": event,
+        }
 
         self.cache_state.append(label)
 
@@ -94,8 +136,17 @@ class MoonStreamEventState(EventScannerState):
         if not self.cache_state:
             return
 
+        timestamps = get_block_timestamps(
+            self.db_session,
+            self.web3,
+            [label["block_number"] for label in self.cache_state],
+        )
+        for label in self.cache_state:
+            label["timestamp"] = timestamps[label["block_number"]]
+
         try:
-            self.db_session.add_all(self.cache_state)
+            # Inserting plain mappings lets SQLAlchemy batch the rows into a single executemany
+            self.db_session.bulk_insert_mappings(EthereumLabel, self.cache_state)
             self.db_session.commit()
 
         except Exception as e:
@@ -0,0 +1,84 @@
+import unittest
+
+from moonworm.crawler.cache import SLRUCache
+
+
+class TestSLRUCache(unittest.TestCase):
+    def test_new_entries_are_evicted_in_insertion_order(self):
+        cache = SLRUCache(probation_size=2, protected_size=2)
+        cache[1] = "a"
+        cache[2] = "b"
+        cache[3] = "c"
+
+        self.assertNotIn(1, cache)
+        self.assertEqual(cache[2], "b")
+        self.assertEqual(cache[3], "c")
+
+    def test_accessed_entries_survive_a_scan(self):
+        cache = SLRUCache(probation_size=2, protected_size=2)
+        cache[1] = "a"
+        self.assertEqual(cache[1], "a")
+        self.assertEqual(cache[1], "a")
+
+        for key in range(100, 110):
+            cache[key] = str(key)
+
+        self.assertIn(1, cache)
+        self.assertEqual(len(cache), 3)
+        self.assertNotIn(107, cache)
+        self.assertIn(108, cache)
+        self.assertIn(109, cache)
+
+    def test_first_read_after_insert_does_not_promote(self):
+        cache = SLRUCache(probation_size=2, protected_size=2)
+        cache[1] = "a"
+        cache[2] = "b"
+
+        self.assertEqual(cache[1], "a")
+        self.assertEqual(len(cache.protected), 0)
+
+        # The read moved 1 to the most recently used end of the probationary segment
+        cache[3] = "c"
+        self.assertIn(1, cache)
+        self.assertNotIn(2, cache)
+
+        self.assertEqual(cache[1], "a")
+        self.assertIn(1, cache.protected)
+
+    def test_protected_overflow_is_demoted_to_probation(self):
+        cache = SLRUCache(probation_size=2, protected_size=1)
+        cache[1] = "a"
+        cache[2] = "b"
+        for _ in range(2):
+            cache[1]
+            cache[2]
+
+        self.assertIn(1, cache.probation)
+        self.assertIn(2, cache.protected)
+
+        # Demoted entries are promoted again on their next read
+        cache[1]
+        self.assertIn(1, cache.protected)
+        self.assertIn(2, cache.probation)
+
+    def test_peek_does_not_promote(self):
+        cache = SLRUCache(probation_size=2, protected_size=2)
+        cache[1] = "a"
+
+        self.assertEqual(cache.peek(1), "a")
+        self.assertIn(1, cache.probation)
+        self.assertIsNone(cache.peek(2))
+        self.assertIsNone(cache.get(2))
+
+        self.assertEqual(cache.get(1), "a")
+        self.assertEqual(cache.get(1), "a")
+        self.assertIn(1, cache.protected)
+
+    def test_missing_key_raises(self):
+        cache = SLRUCache(probation_size=2, protected_size=2)
+        with self.assertRaises(KeyError):
+            cache[1]
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,42 @@
+import json
+import unittest
+
+from hexbytes import HexBytes
+from web3 import Web3
+from web3.datastructures import AttributeDict
+
+from moonworm.crawler.function_call_crawler import utfy_dict
+from moonworm.crawler.log_scanner import _to_jsonable
+
+
+class TestToJsonable(unittest.TestCase):
+    """
+    Tests that moonworm.crawler.log_scanner._to_jsonable normalizes decoded event arguments the
+    same way as serializing them with Web3.toJSON and parsing the result back.
+    """
+
+    def test_matches_json_round_trip(self):
+        args = AttributeDict(
+            {
+                "from": "0x0000000000000000000000000000000000000001",
+                "tokenId": 2**200,
+                "approved": True,
+                "data": b"\x8d\xa5\xcb[",
+                "hash": HexBytes("0x1234"),
+                "amounts": [1, 2, 3],
+                "pair": (b"\x01", "a", None),
+                "nested": AttributeDict({"value": [HexBytes("0x02")]}),
+            }
+        )
+
+        expected = json.loads(Web3.toJSON(utfy_dict(dict(args))))
+        self.assertEqual(_to_jsonable(args), expected)
+
+    def test_bytes_are_converted_like_web3_to_hex(self):
+        for value in [b"", b"\x00\x01", HexBytes("0xdeadbeef")]:
+            self.assertEqual(_to_jsonable(value), Web3.toHex(value))
+            self.assertEqual(utfy_dict(value), Web3.toHex(value))
+
+
+if __name__ == "__main__":
+    unittest.main()
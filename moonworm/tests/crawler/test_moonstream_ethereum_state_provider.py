@@ -0,0 +1,264 @@
+import os
+import threading
+import unittest
+from types import SimpleNamespace
+from typing import Any, List
+from unittest.mock import MagicMock
+
+# moonstreamdb requires database URIs at import time. These tests never connect to a database,
+# the provider is given a mocked session instead.
+os.environ.setdefault("MOONSTREAM_DB_URI", "postgresql://moonworm@localhost/moonworm")
+os.environ.setdefault(
+    "MOONSTREAM_DB_URI_READ_ONLY", "postgresql://moonworm@localhost/moonworm"
+)
+
+try:
+    from sqlalchemy.dialects import postgresql
+    from sqlalchemy.orm import Session
+
+    from moonworm.crawler.moonstream_ethereum_state_provider import (
+        MoonstreamEthereumStateProvider,
+    )
+    from moonworm.crawler.networks import Network
+except ImportError:
+    MoonstreamEthereumStateProvider = None  # type: ignore
+
+ADDRESS = "0x06012c8cf97BEaD5deAe237070F9587f8E7A266d"
+OTHER_ADDRESS = "0xa0b86991c6218b36c1d19D4a2e9Eb0cE3606eB48"
+
+
+def mock_session(*results: List[Any]) -> MagicMock:
+    """
+    Session whose queries return the given lists of rows, one list per executed query.
+    """
+    session = MagicMock()
+    query = session.query.return_value
+    for method in ["join", "outerjoin", "options", "filter", "order_by"]:
+        getattr(query, method).return_value = query
+    query.yield_per.side_effect = list(results)
+    return session
+
+
+def raw_block(block_number: int) -> SimpleNamespace:
+    return SimpleNamespace(
+        block_number=block_number,
+        hash=f"0xblock{block_number}",
+        timestamp=1000 + block_number,
+    )
+
+
+def raw_tx(block_number: int, transaction_index: int, to_address: str):
+    return SimpleNamespace(
+        block_number=block_number,
+        from_address="0x0000000000000000000000000000000000000001",
+        gas=21000,
+        gas_price=1,
+        hash=f"0x{block_number:04x}{transaction_index:04x}",
+        input="0x",
+        max_fee_per_gas=None,
+        max_priority_fee_per_gas=None,
+        nonce=transaction_index,
+        to_address=to_address,
+        transaction_index=transaction_index,
+        value=0,
+    )
+
+
+@unittest.skipIf(
+    MoonstreamEthereumStateProvider is None, "requires moonworm[moonstream]"
+)
+class TestMoonstreamEthereumStateProvider(unittest.TestCase):
+    def make_provider(self, session: MagicMock) -> "MoonstreamEthereumStateProvider":
+        self.w3 = MagicMock()
+        self.w3.eth.getBlock.side_effect = lambda block_number, **kwargs: {
+            "timestamp": 2000 + block_number,
+            "transactions": [
+                {"to": ADDRESS, "blockNumber": block_number, "hash": b"\x01"},
+                {"to": None, "blockNumber": block_number, "hash": b"\x02"},
+            ],
+        }
+        return MoonstreamEthereumStateProvider(
+            self.w3, Network.ethereum, db_session=session, batch_load_count=3
+        )
+
+    def test_block_without_indexed_transactions_falls_back_to_web3(self):
+        # Block 10 is in the blocks table but has no transactions yet, so the query
+        # (which requires at least one transaction row per block) returns nothing for it.
+        session = mock_session([])
+        provider = self.make_provider(session)
+
+        transactions = provider.get_transactions_to_address(ADDRESS, 10)
+
+        self.w3.eth.getBlock.assert_called_once_with(10, full_transactions=True)
+        self.assertEqual(len(transactions), 1)
+        self.assertEqual(transactions[0]["to"], ADDRESS)
+
+    def test_transactions_to_address_query(self):
+        # The query is only built and compiled, the session is not bound to a database
+        provider = self.make_provider(Session())
+
+        query = provider._transactions_to_address_query(ADDRESS, 10)
+        sql = " ".join(
+            str(
+                query.statement.compile(
+                    dialect=postgresql.dialect(),
+                    compile_kwargs={"literal_binds": True},
+                )
+            ).split()
+        )
+
+        self.assertIn(
+            "FROM ethereum_blocks LEFT OUTER JOIN ethereum_transactions"
+            " ON ethereum_transactions.block_number = ethereum_blocks.block_number"
+            f" AND ethereum_transactions.to_address = '{ADDRESS}'",
+            sql,
+        )
+        self.assertIn(
+            "WHERE ethereum_blocks.block_number >= 10"
+            " AND ethereum_blocks.block_number < 13"
+            " AND (EXISTS (SELECT * FROM ethereum_transactions AS ethereum_transactions_1"
+            " WHERE ethereum_transactions_1.block_number = ethereum_blocks.block_number))",
+            sql,
+        )
+        self.assertIn(
+            "ORDER BY ethereum_blocks.block_number ASC,"
+            " ethereum_transactions.transaction_index ASC",
+            sql,
+        )
+
+    def test_partial_entries_are_cached_for_the_batch(self):
+        session = mock_session(
+            [
+                (raw_block(10), raw_tx(10, 0, ADDRESS)),
+                (raw_block(10), raw_tx(10, 3, ADDRESS)),
+                (raw_block(11), None),
+            ]
+        )
+        provider = self.make_provider(session)
+
+        transactions = provider.get_transactions_to_address(ADDRESS, 10)
+        self.assertEqual([tx["transactionIndex"] for tx in transactions], [0, 3])
+        self.assertEqual(transactions[0]["blockHash"], "0xblock10")
+
+        self.assertEqual(provider.get_transactions_to_address(ADDRESS, 11), [])
+        self.assertEqual(provider.get_block_timestamp(11), 1011)
+        self.assertEqual(session.query.call_count, 1)
+        self.assertEqual(provider.metrics["db_get_block_calls"], 1)
+        self.assertEqual(provider.metrics["db_get_transaction_calls"], 1)
+        self.w3.eth.getBlock.assert_not_called()
+
+        self.assertIn("transactions_for", provider.blocks_cache.peek(10))
+        self.assertNotIn("transactions", provider.blocks_cache.peek(10))
+
+    def test_other_address_does_not_hit_partial_entry(self):
+        session = mock_session(
+            [(raw_block(10), raw_tx(10, 0, ADDRESS))],
+            [(raw_block(10), raw_tx(10, 1, OTHER_ADDRESS))],
+        )
+        provider = self.make_provider(session)
+
+        provider.get_transactions_to_address(ADDRESS, 10)
+        transactions = provider.get_transactions_to_address(OTHER_ADDRESS, 10)
+
+        self.assertEqual(session.query.call_count, 2)
+        self.assertEqual([tx["to"] for tx in transactions], [OTHER_ADDRESS])
+        self.assertEqual(
+            [tx["to"] for tx in provider.get_transactions_to_address(ADDRESS, 10)],
+            [ADDRESS],
+        )
+        self.assertEqual(session.query.call_count, 2)
+
+    def test_cached_transactions_are_returned_as_copies(self):
+        session = mock_session([(raw_block(10), raw_tx(10, 0, ADDRESS))])
+        provider = self.make_provider(session)
+
+        provider.get_transactions_to_address(ADDRESS, 10).clear()
+        provider.get_transactions_to_address(ADDRESS, 10).clear()
+
+        self.assertEqual(len(provider.get_transactions_to_address(ADDRESS, 10)), 1)
+
+    def test_addresses_are_matched_exactly(self):
+        session = mock_session([], [])
+        provider = self.make_provider(session)
+
+        self.assertEqual(len(provider.get_transactions_to_address(ADDRESS, 10)), 1)
+        # Same as the to_address predicate of the database query
+        self.assertEqual(provider.get_transactions_to_address(ADDRESS.lower(), 10), [])
+
+    def read_blocks_once(self, provider, block_numbers) -> None:
+        """
+        Reads blocks the way FunctionCallCrawler.crawl does, once per block.
+        """
+        for block_number in block_numbers:
+            for transaction in provider.get_transactions_to_address(
+                ADDRESS, block_number
+            ):
+                provider.get_block_timestamp(transaction["blockNumber"])
+
+    def test_blocks_loaded_from_db_ahead_are_not_promoted(self):
+        session = mock_session(
+            [(raw_block(block), raw_tx(block, 0, ADDRESS)) for block in range(10, 13)]
+        )
+        provider = self.make_provider(session)
+
+        self.read_blocks_once(provider, range(10, 13))
+
+        self.assertEqual(session.query.call_count, 1)
+        self.assertEqual(len(provider.blocks_cache.protected), 0)
+        self.assertEqual(len(provider.blocks_cache.probation), 3)
+
+    def test_blocks_prefetched_from_web3_are_not_promoted(self):
+        session = mock_session([], [])
+        provider = self.make_provider(session)
+
+        provider.set_prefetch_limit(20)
+        self.read_blocks_once(provider, range(10, 21))
+
+        # Block 10 is fetched on its own, 11-20 are prefetched when 11 is requested
+        self.assertEqual(self.w3.eth.getBlock.call_count, 11)
+        self.assertEqual(session.query.call_count, 2)
+        self.assertEqual(len(provider.blocks_cache.protected), 0)
+        self.assertEqual(len(provider.blocks_cache.probation), 11)
+
+    def test_web3_prefetch_stops_at_limit(self):
+        session = mock_session([], [], [], [])
+        provider = self.make_provider(session)
+
+        provider.set_prefetch_limit(13)
+        self.read_blocks_once(provider, range(10, 14))
+
+        fetched = sorted(c.args[0] for c in self.w3.eth.getBlock.call_args_list)
+        self.assertEqual(fetched, [10, 11, 12, 13])
+        self.assertEqual(max(provider.blocks_cache.probation), 13)
+
+    def test_web3_blocks_are_not_prefetched_without_limit(self):
+        session = mock_session([], [], [])
+        provider = self.make_provider(session)
+
+        self.read_blocks_once(provider, range(10, 13))
+
+        fetched = [c.args[0] for c in self.w3.eth.getBlock.call_args_list]
+        self.assertEqual(fetched, [10, 11, 12])
+
+    def test_web3_prefetch_reuses_threads(self):
+        session = mock_session(*[[] for _ in range(10)])
+        provider = self.make_provider(session)
+        get_block = self.w3.eth.getBlock.side_effect
+        threads = set()
+
+        def record_thread(block_number, **kwargs):
+            threads.add(threading.get_ident())
+            return get_block(block_number, **kwargs)
+
+        self.w3.eth.getBlock.side_effect = record_thread
+
+        provider.set_prefetch_limit(60)
+        self.read_blocks_once(provider, range(10, 61))
+
+        # The main thread fetches block 10, the other blocks are prefetched in batches of 10
+        self.assertEqual(self.w3.eth.getBlock.call_count, 51)
+        self.assertLessEqual(len(threads), provider.web3_prefetch_count + 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
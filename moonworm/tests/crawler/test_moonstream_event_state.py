@@ -0,0 +1,47 @@
+import os
+import unittest
+from unittest.mock import MagicMock
+
+# moonstreamdb requires database URIs at import time. These tests never connect to a database,
+# the state is given a mocked session instead.
+os.environ.setdefault("MOONSTREAM_DB_URI", "postgresql://moonworm@localhost/moonworm")
+os.environ.setdefault(
+    "MOONSTREAM_DB_URI_READ_ONLY", "postgresql://moonworm@localhost/moonworm"
+)
+
+try:
+    from moonworm.crawler.state import moonstream_event_state
+except ImportError:
+    moonstream_event_state = None  # type: ignore
+
+
+@unittest.skipIf(moonstream_event_state is None, "requires moonworm[moonstream]")
+class TestGetBlockTimestamps(unittest.TestCase):
+    def setUp(self):
+        moonstream_event_state.BLOCK_TIMESTAMP_CACHE.clear()
+        self.db_session = MagicMock()
+        query = self.db_session.query.return_value
+        query.filter.return_value = query
+        query.all.return_value = [(10, 1010), (12, 1012)]
+        self.web3 = MagicMock()
+        self.web3.eth.get_block.side_effect = lambda block_number: {
+            "timestamp": 2000 + block_number
+        }
+
+    def test_uncached_blocks_are_loaded_with_one_query(self):
+        timestamps = moonstream_event_state.get_block_timestamps(
+            self.db_session, self.web3, [10, 11, 12, 10]
+        )
+
+        self.assertEqual(timestamps, {10: 1010, 11: 2011, 12: 1012})
+        self.assertEqual(self.db_session.query.call_count, 1)
+        self.web3.eth.get_block.assert_called_once_with(11)
+
+        moonstream_event_state.get_block_timestamps(
+            self.db_session, self.web3, [10, 11]
+        )
+        self.assertEqual(self.db_session.query.call_count, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,80 @@
+import threading
+import unittest
+from unittest.mock import MagicMock
+
+from hexbytes import HexBytes
+from web3 import Web3
+
+from moonworm.contracts import ERC20
+from moonworm.crawler.function_call_crawler import FunctionCallCrawler
+from moonworm.watch import MockState, _BackgroundCall
+
+CONTRACT_ADDRESS = "0x06012c8cf97BEaD5deAe237070F9587f8E7A266d"
+# As in watch_contract, ABI items without a name (e.g. the constructor) are not crawled
+CONTRACT_ABI = [item for item in ERC20.abi() if item.get("name") is not None]
+
+
+class TestBackgroundCall(unittest.TestCase):
+    def test_returns_result(self):
+        call = _BackgroundCall(lambda a, b: a + b, 1, 2)
+        self.assertEqual(call.result(), 3)
+
+    def test_raises_exception_of_call(self):
+        def fail():
+            raise ValueError("failed")
+
+        call = _BackgroundCall(fail)
+        with self.assertRaises(ValueError):
+            call.result()
+
+    def test_does_not_block_interpreter_exit(self):
+        release = threading.Event()
+        call = _BackgroundCall(release.wait)
+        self.assertTrue(call._thread.daemon)
+        release.set()
+        self.assertTrue(call.result())
+
+
+class TestMockState(unittest.TestCase):
+    def make_transaction(self):
+        contract = Web3().eth.contract(abi=CONTRACT_ABI)
+        return {
+            "blockHash": HexBytes("0x01"),
+            "blockNumber": 1,
+            "hash": HexBytes("0x02"),
+            "to": CONTRACT_ADDRESS,
+            "from": CONTRACT_ADDRESS,
+            "input": contract.encodeABI(fn_name="transfer", args=[CONTRACT_ADDRESS, 1]),
+        }
+
+    def test_flush_errors_are_not_reported_as_decode_errors(self):
+        def fail_output(calls):
+            raise OSError("disk full")
+
+        on_flush = MagicMock(side_effect=fail_output)
+        state = MockState(batch_size=1, on_flush=on_flush)
+        provider = MagicMock()
+        provider.get_transaction_reciept.return_value = {"status": 1, "gasUsed": 1}
+        provider.get_block_timestamp.return_value = 0
+        on_decode_error = MagicMock()
+        crawler = FunctionCallCrawler(
+            state,
+            provider,
+            CONTRACT_ABI,
+            [CONTRACT_ADDRESS],
+            on_decode_error=on_decode_error,
+        )
+
+        with self.assertRaises(OSError):
+            crawler.process_transaction(self.make_transaction())
+        on_decode_error.assert_not_called()
+
+        # The failed batch is not output again with the next call
+        with self.assertRaises(OSError):
+            crawler.process_transaction(self.make_transaction())
+        self.assertEqual([len(c.args[0]) for c in on_flush.call_args_list], [1, 1])
+        self.assertEqual(state.state, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
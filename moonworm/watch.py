@@ -7,9 +7,10 @@ and it is what powers the "moonworm watch" command.
 
 import json
 import pprint as pp
+import threading
 import time
 from dataclasses import asdict
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 from eth_typing.evm import ChecksumAddress
 from tqdm import tqdm
@@ -24,12 +25,27 @@ from .crawler.function_call_crawler import (
     FunctionCallCrawlerState,
     Web3StateProvider,
 )
-from .crawler.log_scanner import _crawl_events, _fetch_events_chunk
+from .crawler.log_scanner import (
+    EventABIsByTopic,
+    _crawl_events,
+    _fetch_events_chunk,
+)
 
 
 class MockState(FunctionCallCrawlerState):
-    def __init__(self) -> None:
+    """
+    Keeps crawled function calls in memory, passing them to on_flush (if provided) whenever
+    batch_size calls have been registered or flush is called.
+    """
+
+    def __init__(
+        self,
+        batch_size: int = 1000,
+        on_flush: Optional[Callable[[List[ContractFunctionCall]], None]] = None,
+    ) -> None:
         self.state: List[ContractFunctionCall] = []
+        self.batch_size = batch_size
+        self.on_flush = on_flush
 
     def get_last_crawled_block(self) -> int:
         """
@@ -42,12 +58,46 @@ class MockState(FunctionCallCrawlerState):
         Processes the given function call (store it, etc.).
         """
         self.state.append(function_call)
+        if len(self.state) >= self.batch_size:
+            self.flush()
 
     def flush(self) -> None:
         """
         Flushes cached state to storage layer.
         """
-        self.state = []
+        # The buffer is cleared first, so that calls are not output again if on_flush fails
+        calls, self.state = self.state, []
+        if self.on_flush is not None and calls:
+            self.on_flush(calls)
+
+
+class _BackgroundCall:
+    """
+    Runs a function in a daemon thread. Unlike ThreadPoolExecutor workers, daemon threads are not
+    joined when the interpreter exits, so a call whose result is no longer needed never keeps the
+    process alive.
+    """
+
+    def __init__(self, fn: Callable[..., Any], *args: Any) -> None:
+        self._result: Any = None
+        self._error: Optional[BaseException] = None
+        self._thread = threading.Thread(target=self._run, args=(fn, args), daemon=True)
+        self._thread.start()
+
+    def _run(self, fn: Callable[..., Any], args: Tuple[Any, ...]) -> None:
+        try:
+            self._result = fn(*args)
+        except BaseException as e:
+            self._error = e
+
+    def result(self) -> Any:
+        """
+        Waits for the call to finish and returns its result, raising its exception if it failed.
+        """
+        self._thread.join()
+        if self._error is not None:
+            raise self._error
+        return self._result
 
 
 # TODO(yhtiyar), use state_provider.get_last_block
@@ -115,8 +165,18 @@ def watch_contract(
 
     contract_abi = [item for item in contract_abi if item.get("name") is not None]
 
+    ofp = None
+
+    def output_calls(calls: List[ContractFunctionCall]) -> None:
+        print("Got transaction calls:")
+        for call in calls:
+            pp.pprint(call, width=200, indent=4)
+            if ofp is not None:
+                print(json.dumps(asdict(call)), file=ofp)
+                ofp.flush()
+
     current_batch_size = min_blocks_batch
-    state = MockState()
+    state = MockState(on_flush=output_calls)
     crawler = FunctionCallCrawler(
         state,
         state_provider,
@@ -125,6 +185,8 @@ def watch_contract(
     )
 
     event_abis = [item for item in contract_abi if item["type"] == "event"]
+    # Indexed once, so that the polling loop does not recompute event topics on every iteration
+    events_by_topic = EventABIsByTopic.from_abis(event_abis)
 
     if start_block is None:
         current_block = web3.eth.blockNumber - num_confirmations * 2
@@ -133,7 +195,6 @@ def watch_contract(
 
     progress_bar = tqdm(unit=" blocks")
     progress_bar.set_description(f"Current block {current_block}")
-    ofp = None
     if outfile is not None:
         ofp = open(outfile, "a")
 
@@ -151,21 +212,17 @@ def watch_contract(
                 continue
 
             sleep_time /= 2
-            if not only_events:
-                crawler.crawl(current_block, until_block)
-                if state.state:
-                    print("Got transaction calls:")
-                    for call in state.state:
-                        pp.pprint(call, width=200, indent=4)
-                        if ofp is not None:
-                            print(json.dumps(asdict(call)), file=ofp)
-                            ofp.flush()
-                    state.flush()
-
-            for event_abi in event_abis:
-                all_events, new_batch_size = _crawl_events(
+
+            events_call = None
+            if event_abis:
+                # All event types are fetched with a single eth_getLogs call per chunk. Events only
+                # need web3, so they are fetched in the background while method calls are crawled.
+                # If the call crawler raises or the watcher is interrupted, the background fetch
+                # is abandoned and does not delay the exit.
+                events_call = _BackgroundCall(
+                    _crawl_events,
                     web3,
-                    event_abi,
+                    events_by_topic,
                     current_block,
                     until_block,
                     current_batch_size,
@@ -175,6 +232,14 @@ def watch_contract(
                     min_blocks_batch,
                 )
 
+            if not only_events:
+                # Calls are also flushed while crawling, every state.batch_size calls
+                crawler.crawl(current_block, until_block)
+                state.flush()
+
+            if events_call is not None:
+                all_events, new_batch_size = events_call.result()
+
                 if only_events:
                     # Updating batch size only in `--only-events` mode
                     # otherwise it will start taking too much if we also crawl transactions